@@ -8,7 +8,6 @@ import os
 import csv
 import asyncio
 import logging
-import sqlite3
 import json
 import random
 import re
@@ -16,7 +15,7 @@ import html
 import fcntl
 from datetime import datetime
 from typing import Dict, List, Optional
-from functools import lru_cache
+from functools import wraps
 
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import (
@@ -28,6 +27,8 @@ from telegram.ext import (
 )
 from telegram.error import TelegramError, BadRequest
 
+from database import DatabaseManager
+
 # ==============================
 # CONFIGURATION
 # ==============================
@@ -81,6 +82,9 @@ def acquire_startup_lock():
 # TEXT SANITIZATION
 # ==============================
 
+_MARKDOWN_ESCAPES = str.maketrans({char: f'\\{char}' for char in '_*[]()~`>#+-=|{}.!'})
+_BACKSLASH_RUN_RE = re.compile(r'\\{2,}')
+
 def sanitize_text(text: str) -> str:
     """
     Sanitize text to prevent Markdown parsing errors.
@@ -92,13 +96,12 @@ def sanitize_text(text: str) -> str:
     # First escape HTML characters
     text = html.escape(text)
     
-    # Escape Markdown special characters
-    markdown_chars = ['_', '*', '[', ']', '(', ')', '~', '`', '>', '#', '+', '-', '=', '|', '{', '}', '.', '!']
-    for char in markdown_chars:
-        text = text.replace(char, f'\\{char}')
+    # Escape Markdown special characters in a single str.translate pass
+    text = text.translate(_MARKDOWN_ESCAPES)
     
-    # Remove any remaining problematic sequences
-    text = re.sub(r'\\+', r'\\', text)
+    # Remove any remaining problematic sequences (backslash runs)
+    if '\\\\' in text:
+        text = _BACKSLASH_RUN_RE.sub(r'\\', text)
     
     return text
 
@@ -122,6 +125,18 @@ def validate_subtopic_name(subtopic: str) -> bool:
         return False
     return re.match(r'^[\w\s-]+$', subtopic) is not None
 
+_NUM_RE = re.compile(r'(\d+)_')
+
+# Either case is accepted, so validation needs no .upper() copy per row
+_ANSWER_LETTERS = frozenset('ABCDabcd')
+
+def subtopic_sort_key(name: str):
+    """Sort numbered names ("2_...", "10_...") numerically, unnumbered ones last"""
+    match = _NUM_RE.match(name)
+    if match:
+        return (0, int(match.group(1)), name)
+    return (1, 0, name)
+
 # ==============================
 # DYNAMIC DATA MANAGER
 # ==============================
@@ -149,32 +164,34 @@ class DataManager:
     @staticmethod
     def get_existing_topics() -> List[str]:
         """Get list of existing topics from data folder"""
-        data_dir = CONFIG["data_dir"]
-        if not os.path.exists(data_dir):
+        try:
+            # Name check first; DirEntry.is_dir() uses the type from the directory read, no stat per entry
+            with os.scandir(CONFIG["data_dir"]) as entries:
+                topics = [e.name for e in entries if not e.name.startswith('.') and e.is_dir()]
+        except (FileNotFoundError, NotADirectoryError):
             return []
-        
-        topics = [d for d in os.listdir(data_dir) 
-                 if os.path.isdir(os.path.join(data_dir, d)) and not d.startswith('.')]
         return sorted(topics)
     
     @staticmethod
     def scan_for_new_files():
         """Scan for any new CSV files that were added manually"""
         data_dir = CONFIG["data_dir"]
-        if not os.path.exists(data_dir):
+        if not os.path.isdir(data_dir):
             return False
-    
         new_files_found = False
-    
-        for topic in os.listdir(data_dir):
-            topic_path = os.path.join(data_dir, topic)
-            if os.path.isdir(topic_path):
-                for file in os.listdir(topic_path):
-                    if file.endswith('.csv') and not file.startswith('.'):
-                        file_path = os.path.join(topic_path, file)
-                        logger.debug(f"Found CSV file: {topic}/{file}")
-                        new_files_found = True
-    
+
+        # data/<topic>/*.csv only; DirEntry carries the file type so no extra stat per entry
+        with os.scandir(data_dir) as topics:
+            topic_dirs = [entry for entry in topics if entry.is_dir()]
+        for topic in topic_dirs:
+            with os.scandir(topic.path) as files:
+                csv_count = sum(1 for file in files
+                                if file.name.endswith('.csv') and not file.name.startswith('.') and not file.is_dir())
+            # One summary line per topic instead of one log record per file
+            if csv_count:
+                logger.debug(f"Found {csv_count} CSV files in {topic.name}")
+                new_files_found = True
+
         return new_files_found
 
 # ==============================
@@ -228,89 +245,6 @@ class CallbackManager:
 # DATABASE MANAGEMENT
 # ==============================
 
-class DatabaseManager:
-    def __init__(self, db_file: str):
-        self.db_file = db_file
-        self.init_database()
-    
-    def init_database(self):
-        try:
-            with sqlite3.connect(self.db_file) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS users (
-                        user_id INTEGER PRIMARY KEY,
-                        username TEXT,
-                        first_name TEXT,
-                        last_name TEXT,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    )
-                ''')
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS user_progress (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        user_id INTEGER,
-                        topic TEXT NOT NULL,
-                        subtopic TEXT NOT NULL,
-                        score INTEGER DEFAULT 0,
-                        total_questions INTEGER DEFAULT 0,
-                        completed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        FOREIGN KEY (user_id) REFERENCES users (user_id)
-                    )
-                ''')
-                conn.commit()
-                logger.info("✅ Database initialized successfully")
-        except sqlite3.Error as e:
-            logger.error(f"❌ Database error: {e}")
-    
-    def update_user(self, user_id: int, username: str, first_name: str, last_name: str):
-        try:
-            with sqlite3.connect(self.db_file) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT OR REPLACE INTO users 
-                    (user_id, username, first_name, last_name)
-                    VALUES (?, ?, ?, ?)
-                ''', (user_id, username, first_name, last_name))
-                conn.commit()
-        except sqlite3.Error as e:
-            logger.error(f"❌ Error updating user {user_id}: {e}")
-    
-    def save_user_progress(self, user_id: int, topic: str, subtopic: str, score: int, total_questions: int):
-        try:
-            with sqlite3.connect(self.db_file) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT INTO user_progress 
-                    (user_id, topic, subtopic, score, total_questions)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (user_id, topic, subtopic, score, total_questions))
-                conn.commit()
-                logger.info(f"✅ Saved progress for user {user_id}: {score}/{total_questions}")
-        except sqlite3.Error as e:
-            logger.error(f"❌ Error saving progress: {e}")
-    
-    def get_user_stats(self, user_id: int) -> Dict:
-        try:
-            with sqlite3.connect(self.db_file) as conn:
-                cursor = conn.cursor()
-                cursor.execute('SELECT COUNT(*) FROM user_progress WHERE user_id = ?', (user_id,))
-                total_quizzes = cursor.fetchone()[0] or 0
-                
-                cursor.execute('''
-                    SELECT AVG(score * 100.0 / total_questions) 
-                    FROM user_progress WHERE user_id = ? AND total_questions > 0
-                ''', (user_id,))
-                avg_score = cursor.fetchone()[0] or 0
-                
-                return {
-                    'total_quizzes': total_quizzes,
-                    'average_score': round(avg_score, 1)
-                }
-        except sqlite3.Error as e:
-            logger.error(f"❌ Error getting stats: {e}")
-            return {'total_quizzes': 0, 'average_score': 0}
-
 # Initialize database
 db = DatabaseManager(CONFIG["database_file"])
 
@@ -343,42 +277,86 @@ class QuizManager:
         
         return shuffled_question
 
+def _dir_cache(func):
+    """Memoize a listing of data_dir/<args> until that directory's mtime changes"""
+    # args -> (st_mtime_ns, result); adding or removing an entry bumps the directory's mtime
+    cache: Dict[tuple, tuple] = {}
+    
+    @wraps(func)
+    def wrapper(*args):
+        try:
+            mtime = os.stat(os.path.join(CONFIG["data_dir"], *args)).st_mtime_ns
+        except OSError:
+            return func(*args)
+        cached = cache.get(args)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        result = func(*args)
+        cache[args] = (mtime, result)
+        return result
+    
+    wrapper.cache_clear = cache.clear
+    return wrapper
+
 class FileManager:
     @staticmethod
-    @lru_cache(maxsize=32)
+    @_dir_cache
     def list_topics() -> List[str]:
-        """Dynamically list all available topics (cached)"""
+        """Dynamically list all available topics (cached until data_dir changes)"""
         return DataManager.get_existing_topics()
     
     @staticmethod
-    @lru_cache(maxsize=128)
+    @_dir_cache
     def list_subtopics(topic: str) -> List[str]:
-        """Dynamically list all available subtopics for a topic (cached)"""
+        """Dynamically list all available subtopics for a topic (cached until the folder changes)"""
         if not validate_topic_name(topic):
             logger.warning(f"❌ Invalid topic name: {topic}")
             return []
             
         topic_path = os.path.join(CONFIG["data_dir"], topic)
         
-        if not os.path.exists(topic_path):
-            logger.warning(f"❌ Topic path does not exist: {topic_path}")
-            return []
-        
         # Get all CSV files and return their names without extension
         subtopics = []
-        for file in os.listdir(topic_path):
-            if file.endswith('.csv') and not file.startswith('.'):
-                # Return the filename without .csv extension
-                subtopic_name = file[:-4]
-                if validate_subtopic_name(subtopic_name):
-                    subtopics.append(subtopic_name)
+        try:
+            with os.scandir(topic_path) as entries:
+                for entry in entries:
+                    file = entry.name
+                    # Name checks first; is_file() comes from the directory read
+                    if file.endswith('.csv') and not file.startswith('.') and entry.is_file():
+                        # Return the filename without .csv extension
+                        subtopic_name = file[:-4]
+                        if validate_subtopic_name(subtopic_name):
+                            subtopics.append(subtopic_name)
+        except (FileNotFoundError, NotADirectoryError):
+            logger.warning(f"❌ Topic path does not exist: {topic_path}")
+            return []
         
         logger.info(f"✅ Found {len(subtopics)} subtopics for {topic}: {subtopics}")
-        return sorted(subtopics)
+        return sorted(subtopics, key=subtopic_sort_key)
+    
+    # path -> ((st_mtime_ns, st_size), result) so unchanged files are validated once
+    _validation_cache: Dict[str, tuple] = {}
     
     @staticmethod
     def validate_csv_format(file_path: str) -> bool:
-        """Validate CSV file has correct format"""
+        """Validate CSV file has correct format (cached until the file changes)"""
+        try:
+            st = os.stat(file_path)
+        except OSError as e:
+            logger.error(f"❌ CSV validation failed: {e}")
+            return False
+        key = (st.st_mtime_ns, st.st_size)
+        cached = FileManager._validation_cache.get(file_path)
+        if cached and cached[0] == key:
+            return cached[1]
+        
+        result = FileManager._validate_csv_rows(file_path)
+        FileManager._validation_cache[file_path] = (key, result)
+        return result
+    
+    @staticmethod
+    def _validate_csv_rows(file_path: str) -> bool:
+        """Check every row has six columns and a valid answer letter"""
         try:
             with open(file_path, 'r', encoding='utf-8') as f:
                 reader = csv.reader(f)
@@ -388,7 +366,7 @@ class FileManager:
                     if len(row) < 6:
                         logger.warning(f"❌ Row {i}: insufficient columns")
                         return False
-                    if row[5].upper() not in ['A', 'B', 'C', 'D']:
+                    if row[5] not in _ANSWER_LETTERS:
                         logger.warning(f"❌ Row {i}: invalid correct answer '{row[5]}'")
                         return False
             return True
@@ -408,15 +386,15 @@ class FileManager:
         filename = f"{subtopic}.csv"
         file_path = os.path.join(CONFIG["data_dir"], topic, filename)
         
-        logger.info(f"📁 Loading questions from: {file_path}")
+        logger.debug(f"📁 Loading questions from: {file_path}")
         
         if not os.path.exists(file_path):
             logger.error(f"❌ Question file not found: {file_path}")
-            # Try to find the file with different case
+            # Try to find the file with different case (listing only built when debugging)
             topic_path = os.path.join(CONFIG["data_dir"], topic)
-            if os.path.exists(topic_path):
+            if logger.isEnabledFor(logging.DEBUG) and os.path.isdir(topic_path):
                 available_files = [f for f in os.listdir(topic_path) if f.endswith('.csv')]
-                logger.info(f"📂 Available files in {topic}: {available_files}")
+                logger.debug(f"📂 Available files in {topic}: {available_files}")
             
             return []
         
@@ -431,6 +409,9 @@ class FileManager:
                 reader = csv.reader(f)
                 row_count = 0
                 valid_questions = 0
+                invalid_answers = 0
+                # Per-row details only when debugging; a summary is logged once below
+                debug = logger.isEnabledFor(logging.DEBUG)
                 
                 for i, row in enumerate(reader, 1):
                     row_count += 1
@@ -439,17 +420,20 @@ class FileManager:
                     if not row or not any(row) or row[0].startswith('#') or len(row) < 6:
                         continue
                     
-                    # Clean and validate data
-                    cleaned_row = [x.strip() for x in row[:6] if x.strip()]
-                    if len(cleaned_row) < 6:
+                    # Clean and validate data: strip each field once, reject rows with a blank field
+                    question, opt_a, opt_b, opt_c, opt_d, correct = (
+                        row[0].strip(), row[1].strip(), row[2].strip(),
+                        row[3].strip(), row[4].strip(), row[5].strip())
+                    if not (question and opt_a and opt_b and opt_c and opt_d and correct):
                         continue
                     
-                    question, opt_a, opt_b, opt_c, opt_d, correct = cleaned_row
                     correct = correct.upper()
                     
                     # Validate correct answer format
-                    if correct not in ['A', 'B', 'C', 'D']:
-                        logger.warning(f"⚠️ Invalid correct answer in row {i}: '{correct}'")
+                    if correct not in _ANSWER_LETTERS:
+                        invalid_answers += 1
+                        if debug:
+                            logger.debug(f"⚠️ Invalid correct answer in row {i}: '{correct}'")
                         continue
                     
                     # Sanitize all text
@@ -467,7 +451,10 @@ class FileManager:
                     })
                     valid_questions += 1
             
-            logger.info(f"✅ Loaded {valid_questions} valid questions from {row_count} rows")
+            logger.info(f"✅ Loaded {valid_questions} valid questions from {row_count} rows in {file_path}")
+            
+            if invalid_answers:
+                logger.warning(f"⚠️ Skipped {invalid_answers} rows with an invalid correct answer in {file_path}")
             
             if valid_questions == 0:
                 logger.warning(f"⚠️ No valid questions found in {file_path}")
@@ -769,47 +756,49 @@ async def handle_subtopic_selection(update: Update, context: ContextTypes.DEFAUL
     await send_next_question(update, context)
 
 async def send_next_question(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Send the next question in the quiz"""
+    """Send the next question in the quiz, skipping any that fail to send"""
     user_data = context.user_data
     
-    if not user_data.get("quiz_active"):
-        return
-    
-    current_index = user_data["current_question"]
-    questions = user_data["questions"]
-    chat_id = user_data["chat_id"]
-    
-    if current_index >= len(questions):
-        await finish_quiz(update, context)
-        return
-    
-    original_question = questions[current_index]
-    shuffled_question = QuizManager.shuffle_choices(original_question)
-    user_data["current_shuffled"] = shuffled_question
-    
-    progress = f"Question {current_index + 1}/{len(questions)}\n\n"
-    question_text = progress + shuffled_question["question"]
-    
-    try:
-        message = await context.bot.send_poll(
-            chat_id=chat_id,
-            question=question_text,
-            options=shuffled_question["options"],
-            type="quiz",
-            correct_option_id=shuffled_question["correct_index"],
-            is_anonymous=False,
-        )
+    # Loop instead of recursing on failure so repeated send errors don't grow the await chain
+    while True:
+        if not user_data.get("quiz_active"):
+            return
+        
+        current_index = user_data["current_question"]
+        questions = user_data["questions"]
+        chat_id = user_data["chat_id"]
         
-        user_data["active_poll_id"] = message.poll.id
-        user_data["poll_message_id"] = message.message_id
+        if current_index >= len(questions):
+            await finish_quiz(update, context)
+            return
         
-        logger.info(f"✅ Sent question {current_index + 1} to user {chat_id}")
+        original_question = questions[current_index]
+        shuffled_question = QuizManager.shuffle_choices(original_question)
+        user_data["current_shuffled"] = shuffled_question
         
-    except Exception as e:
-        logger.error(f"❌ Error sending question {current_index + 1}: {e}")
-        user_data["current_question"] += 1
-        await asyncio.sleep(2)
-        await send_next_question(update, context)
+        progress = f"Question {current_index + 1}/{len(questions)}\n\n"
+        question_text = progress + shuffled_question["question"]
+        
+        try:
+            message = await context.bot.send_poll(
+                chat_id=chat_id,
+                question=question_text,
+                options=shuffled_question["options"],
+                type="quiz",
+                correct_option_id=shuffled_question["correct_index"],
+                is_anonymous=False,
+            )
+            
+            user_data["active_poll_id"] = message.poll.id
+            user_data["poll_message_id"] = message.message_id
+            
+            logger.info(f"✅ Sent question {current_index + 1} to user {chat_id}")
+            return
+            
+        except Exception as e:
+            logger.error(f"❌ Error sending question {current_index + 1}: {e}")
+            user_data["current_question"] += 1
+            await asyncio.sleep(2)
 
 async def handle_poll_answer(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle poll answers"""
@@ -991,6 +980,9 @@ def main():
         logger.error(f"❌ Failed to start bot: {e}")
         print(f"❌ Bot failed to start: {e}")
     finally:
+        # Write out any buffered progress before exiting
+        db.close()
+        
         # Release lock on exit
         if lock_fd:
             try:
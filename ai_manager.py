@@ -4,6 +4,7 @@ AI integration with college PDF context - UPDATED FOR HISTOLOGY
 import os
 import logging
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import asyncio
 from typing import Dict, List, Optional
@@ -16,6 +17,10 @@ logger = logging.getLogger(__name__)
 class AIManager:
     def __init__(self):
         self.ai_service_url = os.getenv("AI_SERVICE_URL", "http://localhost:5001/ai")
+        # Keep-alive session so repeated AI calls reuse the connection
+        self.http = requests.Session()
+        self.http.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=8))
+        self.http.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=8))
         self.pdf_manager = PDFManager()
         
     async def explain_question(self, question_data: Dict, user_question: str, subject: str) -> str:
@@ -193,11 +198,15 @@ class AIManager:
                 "max_tokens": 500
             }
             
-            response = requests.post(
-                self.ai_service_url,
-                json=payload,
-                headers={"Content-Type": "application/json"},
-                timeout=30
+            # Blocking HTTP call runs in a worker thread so the event loop keeps serving updates
+            response = await asyncio.get_event_loop().run_in_executor(
+                None,
+                lambda: self.http.post(
+                    self.ai_service_url,
+                    json=payload,
+                    headers={"Content-Type": "application/json"},
+                    timeout=(3, 30)  # (connect, read): fail fast if the service is down
+                )
             )
             
             if response.status_code == 200:
@@ -64,4 +64,4 @@ def get_college_pdf_path(subject: str, pdf_type: str = "primary_textbook") -> st
 
 def get_available_subjects() -> list:
     """Get list of subjects with college PDFs"""
-    return list(COLLEGE_PDFS.keys())
\ No newline at end of file
+    return list(COLLEGE_PDFS)
\ No newline at end of file
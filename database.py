@@ -3,20 +3,232 @@ Database management - CLEAN VERSION (No Google Sheets)
 """
 import sqlite3
 import logging
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
 from typing import Dict
 
 logger = logging.getLogger(__name__)
 
+# SQL text is declared once so every call hits the connection's statement cache
+# Returning users only need the UPDATE; an UPDATE that matches no row means the user is new
+_SQL_UPDATE_USER = "UPDATE users SET username = ?, first_name = ?, last_name = ? WHERE user_id = ?"
+_SQL_INSERT_USER = "INSERT INTO users (user_id, username, first_name, last_name) VALUES (?, ?, ?, ?)"
+_SQL_INSERT_PROGRESS = (
+    "INSERT INTO user_progress (user_id, topic, subtopic, score, total_questions) "
+    "VALUES (?, ?, ?, ?, ?)"
+)
+_SQL_INSERT_ESSAY = (
+    "INSERT INTO essay_progress (user_id, essay_id, question, user_response, score, "
+    "feedback, key_concepts, essential_terms) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+# Running per-user totals on the users table, so stats never scan the progress tables
+_STATS_COUNTER_COLUMNS = {
+    "quiz_count": "INTEGER DEFAULT 0",
+    "quiz_scored_count": "INTEGER DEFAULT 0",   # quizzes with total_questions > 0
+    "quiz_pct_sum": "REAL DEFAULT 0",           # sum of score * 100 / total_questions
+    "essay_count": "INTEGER DEFAULT 0",
+    "essay_scored_count": "INTEGER DEFAULT 0",  # essays with a non-NULL score
+    "essay_score_sum": "REAL DEFAULT 0",
+}
+_SQL_BACKFILL_COUNTERS = (
+    "UPDATE users SET "
+    "quiz_count = (SELECT COUNT(*) FROM user_progress p WHERE p.user_id = users.user_id), "
+    "quiz_scored_count = (SELECT COUNT(*) FROM user_progress p "
+    "WHERE p.user_id = users.user_id AND p.total_questions > 0), "
+    "quiz_pct_sum = (SELECT COALESCE(SUM(score * 100.0 / total_questions), 0) FROM user_progress p "
+    "WHERE p.user_id = users.user_id AND p.total_questions > 0), "
+    "essay_count = (SELECT COUNT(*) FROM essay_progress e WHERE e.user_id = users.user_id), "
+    "essay_scored_count = (SELECT COUNT(score) FROM essay_progress e WHERE e.user_id = users.user_id), "
+    "essay_score_sum = (SELECT COALESCE(SUM(score), 0) FROM essay_progress e WHERE e.user_id = users.user_id)"
+)
+_SQL_BUMP_QUIZ_COUNTERS = (
+    "INSERT INTO users (user_id, quiz_count, quiz_scored_count, quiz_pct_sum) VALUES (?, 1, ?, ?) "
+    "ON CONFLICT(user_id) DO UPDATE SET quiz_count = quiz_count + 1, "
+    "quiz_scored_count = quiz_scored_count + excluded.quiz_scored_count, "
+    "quiz_pct_sum = quiz_pct_sum + excluded.quiz_pct_sum"
+)
+_SQL_BUMP_ESSAY_COUNTERS = (
+    "INSERT INTO users (user_id, essay_count, essay_scored_count, essay_score_sum) VALUES (?, 1, ?, ?) "
+    "ON CONFLICT(user_id) DO UPDATE SET essay_count = essay_count + 1, "
+    "essay_scored_count = essay_scored_count + excluded.essay_scored_count, "
+    "essay_score_sum = essay_score_sum + excluded.essay_score_sum"
+)
+_SQL_USER_STATS = (
+    "SELECT quiz_count AS total_quizzes, "
+    "quiz_pct_sum / NULLIF(quiz_scored_count, 0) AS average_score, "
+    "essay_count AS total_essays, "
+    "essay_score_sum / NULLIF(essay_scored_count, 0) AS average_essay_score "
+    "FROM users WHERE user_id = ?"
+)
+
 class DatabaseManager:
-    def __init__(self, db_file: str):
+    READ_POOL_SIZE = 4
+    FLUSH_INTERVAL = 0.5   # seconds between background flushes
+    FLUSH_ROWS = 500       # flush early once this many rows are buffered
+    STATS_TTL = 30         # seconds a cached get_user_stats result stays valid
+    STATS_CACHE_SIZE = 1024
+
+    def __init__(self, db_file: str, batch_writes: bool = True):
         self.db_file = db_file
+        self.batch_writes = batch_writes
+        # One mutex-guarded writer plus a pool of read-only readers; WAL lets them run concurrently
+        self._write_conn = sqlite3.connect(self.db_file, check_same_thread=False, isolation_level=None)
+        self._write_lock = threading.Lock()
+        # WAL needs a file; an in-memory database always reports journal_mode=memory
+        self._configure(self._write_conn, wal=self.db_file != ':memory:')
         self.init_database()
+        self._read_pool = None
+        if self.db_file == ':memory:':
+            # A mode=ro URI would open a separate, empty database; read through the writer instead
+            self._write_conn.row_factory = sqlite3.Row
+        else:
+            self._read_pool = queue.Queue()
+            for _ in range(self.READ_POOL_SIZE):
+                reader = sqlite3.connect(f"file:{self.db_file}?mode=ro", uri=True, check_same_thread=False)
+                self._configure(reader)
+                reader.row_factory = sqlite3.Row
+                self._read_pool.put(reader)
+        
+        # Progress rows are buffered and written in one transaction per flush
+        self._progress_buf = deque()
+        self._essay_buf = deque()
+        self._flush_lock = threading.Lock()
+        
+        # user_id -> (timestamp, stats); LRU-bounded, busted whenever the user saves a result
+        self._stats_cache = OrderedDict()
+        self._stats_lock = threading.Lock()
+        # Bumped by every save and committed flush; a stats query only caches if it is unchanged
+        self._stats_generation = 0
+        self._flush_wakeup = threading.Event()
+        self._closing = False
+        self._flusher = None
+        if self.batch_writes:
+            self._flusher = threading.Thread(target=self._flush_loop, name="db-flusher", daemon=True)
+            self._flusher.start()
+    
+    @staticmethod
+    def _configure(conn: sqlite3.Connection, wal: bool = False):
+        """Apply per-connection PRAGMAs (journal_mode persists, the rest do not)"""
+        if wal:
+            # The PRAGMA returns the mode actually in effect, which stays the old one if WAL is unsupported
+            mode = conn.execute('PRAGMA journal_mode=WAL').fetchone()[0]
+            if mode.lower() != 'wal':
+                logger.warning(f"⚠️ SQLite kept journal_mode={mode}, WAL is not enabled; readers will block on writes")
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA busy_timeout=5000')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        conn.execute('PRAGMA cache_size=-20000')
+    
+    @contextmanager
+    def _borrow_reader(self):
+        """Borrow a read-only connection from the pool (the locked writer for :memory:)"""
+        if self._read_pool is None:
+            with self._write_lock:
+                yield self._write_conn
+            return
+        conn = self._read_pool.get()
+        try:
+            yield conn
+        finally:
+            self._read_pool.put(conn)
+    
+    @contextmanager
+    def _transaction(self):
+        """Run a write under the writer lock inside BEGIN IMMEDIATE ... COMMIT"""
+        with self._write_lock:
+            cursor = self._write_conn.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
+            try:
+                yield cursor
+                cursor.execute('COMMIT')
+            except Exception:
+                cursor.execute('ROLLBACK')
+                raise
+    
+    def _flush_loop(self):
+        """Background thread: flush buffered rows every FLUSH_INTERVAL or when FLUSH_ROWS pile up"""
+        while not self._closing:
+            self._flush_wakeup.wait(self.FLUSH_INTERVAL)
+            self._flush_wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                # Keep the thread alive; otherwise rows pile up until the next stats read or close()
+                logger.error(f"❌ Background flush failed: {e}")
+    
+    def _enqueue(self, buf: deque, row: tuple):
+        """Buffer a row for the next flush, or write it straight away when batching is off"""
+        buf.append(row)
+        if not self.batch_writes:
+            self.flush()
+        elif len(self._progress_buf) + len(self._essay_buf) >= self.FLUSH_ROWS:
+            self._flush_wakeup.set()
+    
+    @staticmethod
+    def _write_rows(cursor: sqlite3.Cursor, progress_rows: list, essay_rows: list):
+        """Insert progress rows and bump the matching user counters inside an open transaction"""
+        if progress_rows:
+            cursor.executemany(_SQL_INSERT_PROGRESS, progress_rows)
+            cursor.executemany(_SQL_BUMP_QUIZ_COUNTERS, [
+                (user_id, 1, score * 100.0 / total) if total > 0 else (user_id, 0, 0)
+                for user_id, _, _, score, total in progress_rows
+            ])
+        if essay_rows:
+            cursor.executemany(_SQL_INSERT_ESSAY, essay_rows)
+            cursor.executemany(_SQL_BUMP_ESSAY_COUNTERS, [
+                (row[0], 0, 0) if row[4] is None else (row[0], 1, row[4])
+                for row in essay_rows
+            ])
+    
+    def flush(self):
+        """Write all buffered progress rows in a single transaction"""
+        # Held from drain to commit, so a caller that finds the buffers empty also waits out a write in flight
+        with self._flush_lock:
+            progress_rows = [self._progress_buf.popleft() for _ in range(len(self._progress_buf))]
+            essay_rows = [self._essay_buf.popleft() for _ in range(len(self._essay_buf))]
+            if not progress_rows and not essay_rows:
+                return
+            try:
+                with self._transaction() as cursor:
+                    self._write_rows(cursor, progress_rows, essay_rows)
+                logger.info(f"✅ Saved {len(progress_rows)} quiz and {len(essay_rows)} essay results")
+            except Exception as e:
+                # The batch rolled back; retry row by row so only the offending rows are lost
+                logger.warning(f"⚠️ Progress batch failed ({e}), retrying rows one at a time")
+                singles = [([row], []) for row in progress_rows] + [([], [row]) for row in essay_rows]
+                for progress, essay in singles:
+                    try:
+                        with self._transaction() as cursor:
+                            self._write_rows(cursor, progress, essay)
+                    except Exception as e:
+                        logger.error(f"❌ Dropped unsaveable progress row for user {(progress or essay)[0][0]}: {e}")
+            with self._stats_lock:
+                self._stats_generation += 1
+    
+    def close(self):
+        """Flush pending rows, then close the writer and all pooled reader connections"""
+        self._closing = True
+        if self._flusher:
+            self._flush_wakeup.set()
+            self._flusher.join()
+        self.flush()
+        try:
+            with self._write_lock:
+                # Refresh planner statistics if they have drifted
+                self._write_conn.execute('PRAGMA optimize')
+                self._write_conn.close()
+            while self._read_pool is not None and not self._read_pool.empty():
+                self._read_pool.get_nowait().close()
+        except sqlite3.Error as e:
+            logger.error(f"❌ Error closing database: {e}")
     
     def init_database(self):
         """Initialize database tables"""
         try:
-            with sqlite3.connect(self.db_file) as conn:
-                cursor = conn.cursor()
+            with self._transaction() as cursor:
                 cursor.execute('''
                     CREATE TABLE IF NOT EXISTS users (
                         user_id INTEGER PRIMARY KEY,
@@ -53,94 +265,98 @@ class DatabaseManager:
                         FOREIGN KEY (user_id) REFERENCES users (user_id)
                     )
                 ''')
-                conn.commit()
+                # Per-user indexes on the progress tables (also used by the counter backfill)
+                indexed = cursor.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_up_user'"
+                ).fetchone()
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_up_user ON user_progress(user_id, total_questions)')
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_ep_user ON essay_progress(user_id)')
+                if not indexed:
+                    # Gather planner statistics once when the indexes are new; PRAGMA optimize in close() keeps them fresh
+                    cursor.execute('ANALYZE')
+                self._add_stats_counters(cursor)
+                self._check_progress_indexes(cursor)
                 logger.info("✅ Database initialized successfully")
         except sqlite3.Error as e:
             logger.error(f"❌ Database error: {e}")
     
+    @staticmethod
+    def _check_progress_indexes(cursor: sqlite3.Cursor):
+        """Warn if the per-user progress lookups would fall back to full table scans"""
+        # The backfill's correlated subqueries are the queries that depend on idx_up_user/idx_ep_user;
+        # the outer SCAN users is expected, so only scans nested under a subquery (parent != 0) count
+        plan = cursor.execute('EXPLAIN QUERY PLAN ' + _SQL_BACKFILL_COUNTERS).fetchall()
+        scans = [row[3] for row in plan if row[1] != 0 and row[3].startswith('SCAN')]
+        if scans:
+            logger.warning(f"⚠️ Progress lookups are not using an index: {'; '.join(scans)}")
+    
+    @staticmethod
+    def _add_stats_counters(cursor: sqlite3.Cursor):
+        """Add the stats counter columns to users, backfilling them from existing progress"""
+        existing = {row[1] for row in cursor.execute('PRAGMA table_info(users)')}
+        missing = [name for name in _STATS_COUNTER_COLUMNS if name not in existing]
+        if not missing:
+            return
+        for name in missing:
+            cursor.execute(f'ALTER TABLE users ADD COLUMN {name} {_STATS_COUNTER_COLUMNS[name]}')
+        # Progress may exist for users that never hit /start; give them a row to count against
+        cursor.execute(
+            'INSERT OR IGNORE INTO users (user_id) '
+            'SELECT user_id FROM user_progress UNION SELECT user_id FROM essay_progress'
+        )
+        cursor.execute(_SQL_BACKFILL_COUNTERS)
+        logger.info("✅ Added stats counters to users table")
+    
     def update_user(self, user_id: int, username: str, first_name: str, last_name: str):
         """Update or create user record"""
         try:
-            with sqlite3.connect(self.db_file) as conn:
-                cursor = conn.cursor()
-                
-                cursor.execute('SELECT * FROM users WHERE user_id = ?', (user_id,))
-                existing_user = cursor.fetchone()
-                
-                if not existing_user:
-                    cursor.execute('''
-                        INSERT INTO users (user_id, username, first_name, last_name)
-                        VALUES (?, ?, ?, ?)
-                    ''', (user_id, username, first_name, last_name))
-                    conn.commit()
-                    logger.info(f"✅ New user added: {user_id}")
-                else:
-                    cursor.execute('''
-                        UPDATE users SET username = ?, first_name = ?, last_name = ?
-                        WHERE user_id = ?
-                    ''', (username, first_name, last_name, user_id))
-                    conn.commit()
+            with self._transaction() as cursor:
+                # BEGIN IMMEDIATE holds the write lock, so no other insert can slip in between
+                cursor.execute(_SQL_UPDATE_USER, (username, first_name, last_name, user_id))
+                inserted = cursor.rowcount == 0
+                if inserted:
+                    cursor.execute(_SQL_INSERT_USER, (user_id, username, first_name, last_name))
+            
+            if inserted:
+                logger.info(f"✅ New user added: {user_id}")
                     
         except sqlite3.Error as e:
             logger.error(f"❌ Error updating user {user_id}: {e}")
     
     def save_user_progress(self, user_id: int, topic: str, subtopic: str, score: int, total_questions: int):
         """Save user quiz progress"""
-        try:
-            with sqlite3.connect(self.db_file) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT INTO user_progress 
-                    (user_id, topic, subtopic, score, total_questions)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (user_id, topic, subtopic, score, total_questions))
-                conn.commit()
-                logger.info(f"✅ Saved progress for user {user_id}: {score}/{total_questions}")
-        except sqlite3.Error as e:
-            logger.error(f"❌ Error saving progress: {e}")
+        self._enqueue(self._progress_buf, (user_id, topic, subtopic, score, total_questions))
+        self._invalidate_stats(user_id)
+        logger.info(f"✅ Queued progress for user {user_id}: {score}/{total_questions}")
     
     def save_essay_progress(self, user_id: int, essay_id: str, question: str, user_response: str, 
                            score: float, feedback: str, key_concepts: str, essential_terms: str):
         """Save user essay progress"""
-        try:
-            with sqlite3.connect(self.db_file) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT INTO essay_progress 
-                    (user_id, essay_id, question, user_response, score, feedback, key_concepts, essential_terms)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (user_id, essay_id, question, user_response, score, feedback, key_concepts, essential_terms))
-                conn.commit()
-                logger.info(f"✅ Saved essay progress for user {user_id}: {score}/10")
-        except sqlite3.Error as e:
-            logger.error(f"❌ Error saving essay progress: {e}")
+        self._enqueue(self._essay_buf, (user_id, essay_id, question, user_response, score, feedback, key_concepts, essential_terms))
+        self._invalidate_stats(user_id)
+        logger.info(f"✅ Queued essay progress for user {user_id}: {score}/10")
+    
+    def _invalidate_stats(self, user_id: int):
+        """Drop the cached stats for a user"""
+        with self._stats_lock:
+            self._stats_cache.pop(user_id, None)
+            self._stats_generation += 1
     
     def get_user_stats(self, user_id: int) -> Dict:
-        """Get user statistics"""
+        """Get user statistics (cached for STATS_TTL seconds)"""
+        now = time.monotonic()
+        with self._stats_lock:
+            cached = self._stats_cache.get(user_id)
+            if cached and now - cached[0] < self.STATS_TTL:
+                self._stats_cache.move_to_end(user_id)
+                return dict(cached[1])
+        
+        # Make sure the user's latest results are visible before reading
+        self.flush()
+        with self._stats_lock:
+            generation = self._stats_generation
         try:
-            with sqlite3.connect(self.db_file) as conn:
-                cursor = conn.cursor()
-                cursor.execute('SELECT COUNT(*) FROM user_progress WHERE user_id = ?', (user_id,))
-                total_quizzes = cursor.fetchone()[0] or 0
-                
-                cursor.execute('''
-                    SELECT AVG(score * 100.0 / total_questions) 
-                    FROM user_progress WHERE user_id = ? AND total_questions > 0
-                ''', (user_id,))
-                avg_score = cursor.fetchone()[0] or 0
-                
-                cursor.execute('SELECT COUNT(*) FROM essay_progress WHERE user_id = ?', (user_id,))
-                total_essays = cursor.fetchone()[0] or 0
-                
-                cursor.execute('SELECT AVG(score) FROM essay_progress WHERE user_id = ?', (user_id,))
-                avg_essay_score = cursor.fetchone()[0] or 0
-                
-                return {
-                    'total_quizzes': total_quizzes,
-                    'average_score': round(avg_score, 1),
-                    'total_essays': total_essays,
-                    'average_essay_score': round(avg_essay_score, 1)
-                }
+            stats = self._query_user_stats(user_id)
         except sqlite3.Error as e:
             logger.error(f"❌ Error getting stats: {e}")
             return {
@@ -148,4 +364,27 @@ class DatabaseManager:
                 'average_score': 0,
                 'total_essays': 0,
                 'average_essay_score': 0
-            }
\ No newline at end of file
+            }
+        
+        with self._stats_lock:
+            # A save or flush landed while querying, so the result may already be stale: don't keep it
+            if generation != self._stats_generation:
+                return dict(stats)
+            self._stats_cache[user_id] = (now, stats)
+            self._stats_cache.move_to_end(user_id)
+            while len(self._stats_cache) > self.STATS_CACHE_SIZE:
+                self._stats_cache.popitem(last=False)
+        return dict(stats)
+    
+    def _query_user_stats(self, user_id: int) -> Dict:
+        """Compute user statistics from the database"""
+        with self._borrow_reader() as conn:
+            row = conn.execute(_SQL_USER_STATS, (user_id,)).fetchone()
+        if row is None:
+            return {'total_quizzes': 0, 'average_score': 0, 'total_essays': 0, 'average_essay_score': 0}
+        
+        # Column aliases match the returned keys; averages are rounded for display
+        stats = {key: row[key] or 0 for key in row.keys()}
+        stats['average_score'] = round(stats['average_score'], 1)
+        stats['average_essay_score'] = round(stats['average_essay_score'], 1)
+        return stats
\ No newline at end of file
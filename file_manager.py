@@ -2,253 +2,240 @@
 File management for 6-level navigation structure
 """
 import os
+import re
 import csv
 import logging
-from typing import List, Dict
-from functools import lru_cache
+from typing import List, Dict, Optional
+from functools import wraps
 
 from config import CONFIG, NAVIGATION_STRUCTURE
 from utils import sanitize_text
 
 logger = logging.getLogger(__name__)
 
+_NUM_RE = re.compile(r'(\d+)_')
+
+def _subtopic_sort_key(filename: str):
+    """Sort numbered files ("01_...", "10_...") numerically, unnumbered ones last"""
+    match = _NUM_RE.match(filename)
+    if match:
+        return (0, int(match.group(1)), filename)
+    return (1, 0, filename)
+
+_VALID_ANSWERS = frozenset('ABCD')
+
+# Child-collection key at each level: year -> terms -> blocks -> subjects -> categories -> subtopics
+_LEVEL_KEYS = ("terms", "blocks", "subjects", "categories", "subtopics")
+
+def _index_navigation(children: Dict, path: tuple = (), depth: int = 0, index: Optional[Dict] = None) -> Dict:
+    """Flatten NAVIGATION_STRUCTURE into {(year, term, ...): node} with a single walk"""
+    if index is None:
+        index = {}
+    for name, node in children.items():
+        node_path = path + (name,)
+        index[node_path] = node
+        if depth < len(_LEVEL_KEYS) and isinstance(node, dict) and _LEVEL_KEYS[depth] in node:
+            _index_navigation(node[_LEVEL_KEYS[depth]], node_path, depth + 1, index)
+    return index
+
+# Every navigation path resolves with one dict lookup instead of a chain of nested membership tests
+_NAV_INDEX = _index_navigation(NAVIGATION_STRUCTURE)
+
+def _nav_children(path: tuple) -> Optional[Dict]:
+    """Return the configured children of a navigation node, or None if the path is unknown"""
+    node = _NAV_INDEX.get(path)
+    if not isinstance(node, dict):
+        return None
+    return node.get(_LEVEL_KEYS[len(path) - 1])
+
+def _list_config_dirs(path: str, allowed) -> List[str]:
+    """Sorted subdirectories of path that are also listed in allowed"""
+    try:
+        # Name checks first; DirEntry.is_dir() uses the type from the directory read, no stat per entry
+        with os.scandir(path) as entries:
+            return sorted(e.name for e in entries
+                          if e.name in allowed and not e.name.startswith('.') and e.is_dir())
+    except (FileNotFoundError, NotADirectoryError):
+        return []
+
+def _dir_cache(func):
+    """Memoize a listing of data_dir/<args> until that directory's mtime changes"""
+    # args -> (st_mtime_ns, result); adding or removing an entry bumps the directory's mtime
+    cache: Dict[tuple, tuple] = {}
+    
+    @wraps(func)
+    def wrapper(*args):
+        try:
+            mtime = os.stat(os.path.join(CONFIG["data_dir"], *args)).st_mtime_ns
+        except OSError:
+            return func(*args)
+        cached = cache.get(args)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        result = func(*args)
+        cache[args] = (mtime, result)
+        return result
+    
+    wrapper.cache_clear = cache.clear
+    return wrapper
+
 class FileManager:
     @staticmethod
-    @lru_cache(maxsize=32)
+    @_dir_cache
     def list_years() -> List[str]:
         """Get list of available years from data directory"""
-        data_dir = CONFIG["data_dir"]
-        if not os.path.exists(data_dir):
-            return []
-        
-        years = [d for d in os.listdir(data_dir) 
-                if os.path.isdir(os.path.join(data_dir, d)) 
-                and not d.startswith('.')
-                and d in NAVIGATION_STRUCTURE]
-        return sorted(years)
+        return _list_config_dirs(CONFIG["data_dir"], NAVIGATION_STRUCTURE)
     
     @staticmethod
     def get_year_display_name(year: str) -> str:
         """Get display name for year"""
-        return NAVIGATION_STRUCTURE.get(year, {}).get("display_name", year.replace('_', ' ').title())
+        node = _NAV_INDEX.get((year,))
+        if node and "display_name" in node:
+            return node["display_name"]
+        return year.replace('_', ' ').title()
     
     @staticmethod
-    @lru_cache(maxsize=64)
+    @_dir_cache
     def list_terms(year: str) -> List[str]:
         """Get list of available terms for a year"""
-        if year not in NAVIGATION_STRUCTURE or "terms" not in NAVIGATION_STRUCTURE[year]:
-            return []
-        
-        year_path = os.path.join(CONFIG["data_dir"], year)
-        if not os.path.exists(year_path):
+        expected_terms = _nav_children((year,))
+        if expected_terms is None:
             return []
         
-        terms = [t for t in os.listdir(year_path) 
-                if os.path.isdir(os.path.join(year_path, t))
-                and not t.startswith('.')
-                and t in NAVIGATION_STRUCTURE[year]["terms"]]
-        return sorted(terms)
+        return _list_config_dirs(os.path.join(CONFIG["data_dir"], year), expected_terms)
     
     @staticmethod
     def get_term_display_name(year: str, term: str) -> str:
         """Get display name for term"""
-        if (year in NAVIGATION_STRUCTURE and 
-            "terms" in NAVIGATION_STRUCTURE[year] and
-            term in NAVIGATION_STRUCTURE[year]["terms"]):
-            return NAVIGATION_STRUCTURE[year]["terms"][term]["display_name"]
+        node = _NAV_INDEX.get((year, term))
+        if node is not None:
+            return node["display_name"]
         return term.replace('_', ' ').title()
     
     @staticmethod
-    @lru_cache(maxsize=128)
+    @_dir_cache
     def list_blocks(year: str, term: str) -> List[str]:
         """Get list of available blocks for a term"""
-        if (year not in NAVIGATION_STRUCTURE or 
-            "terms" not in NAVIGATION_STRUCTURE[year] or
-            term not in NAVIGATION_STRUCTURE[year]["terms"]):
+        if (year, term) not in _NAV_INDEX:
             return []
+        expected_blocks = _nav_children((year, term)) or {}
         
-        term_path = os.path.join(CONFIG["data_dir"], year, term)
-        if not os.path.exists(term_path):
-            return []
-        
-        blocks = [b for b in os.listdir(term_path)
-                 if os.path.isdir(os.path.join(term_path, b))
-                 and not b.startswith('.')
-                 and "blocks" in NAVIGATION_STRUCTURE[year]["terms"][term]
-                 and b in NAVIGATION_STRUCTURE[year]["terms"][term]["blocks"]]
-        return sorted(blocks)
+        return _list_config_dirs(os.path.join(CONFIG["data_dir"], year, term), expected_blocks)
     
     @staticmethod
     def get_block_display_name(year: str, term: str, block: str) -> str:
         """Get display name for block"""
-        if (year in NAVIGATION_STRUCTURE and 
-            "terms" in NAVIGATION_STRUCTURE[year] and
-            term in NAVIGATION_STRUCTURE[year]["terms"] and
-            "blocks" in NAVIGATION_STRUCTURE[year]["terms"][term] and
-            block in NAVIGATION_STRUCTURE[year]["terms"][term]["blocks"]):
-            return NAVIGATION_STRUCTURE[year]["terms"][term]["blocks"][block]["display_name"]
+        node = _NAV_INDEX.get((year, term, block))
+        if node is not None:
+            return node["display_name"]
         return block.replace('_', ' ').title()
     
     @staticmethod
-    @lru_cache(maxsize=256)
+    @_dir_cache
     def list_subjects(year: str, term: str, block: str) -> List[str]:
         """Get list of available subjects for a block"""
-        if (year not in NAVIGATION_STRUCTURE or 
-            "terms" not in NAVIGATION_STRUCTURE[year] or
-            term not in NAVIGATION_STRUCTURE[year]["terms"] or
-            "blocks" not in NAVIGATION_STRUCTURE[year]["terms"][term] or
-            block not in NAVIGATION_STRUCTURE[year]["terms"][term]["blocks"]):
-            return []
-        
-        block_path = os.path.join(CONFIG["data_dir"], year, term, block)
-        if not os.path.exists(block_path):
+        if (year, term, block) not in _NAV_INDEX:
             return []
+        expected_subjects = _nav_children((year, term, block)) or {}
         
-        subjects = [s for s in os.listdir(block_path)
-                   if os.path.isdir(os.path.join(block_path, s))
-                   and not s.startswith('.')
-                   and "subjects" in NAVIGATION_STRUCTURE[year]["terms"][term]["blocks"][block]
-                   and s in NAVIGATION_STRUCTURE[year]["terms"][term]["blocks"][block]["subjects"]]
-        return sorted(subjects)
+        return _list_config_dirs(os.path.join(CONFIG["data_dir"], year, term, block), expected_subjects)
     
     @staticmethod
     def get_subject_display_name(year: str, term: str, block: str, subject: str) -> str:
         """Get display name for subject"""
-        if (year in NAVIGATION_STRUCTURE and 
-            "terms" in NAVIGATION_STRUCTURE[year] and
-            term in NAVIGATION_STRUCTURE[year]["terms"] and
-            "blocks" in NAVIGATION_STRUCTURE[year]["terms"][term] and
-            block in NAVIGATION_STRUCTURE[year]["terms"][term]["blocks"] and
-            "subjects" in NAVIGATION_STRUCTURE[year]["terms"][term]["blocks"][block] and
-            subject in NAVIGATION_STRUCTURE[year]["terms"][term]["blocks"][block]["subjects"]):
-            return NAVIGATION_STRUCTURE[year]["terms"][term]["blocks"][block]["subjects"][subject]["display_name"]
+        node = _NAV_INDEX.get((year, term, block, subject))
+        if node is not None:
+            return node["display_name"]
         return subject.title()
     
     @staticmethod
-    @lru_cache(maxsize=512)
+    @_dir_cache
     def list_categories(year: str, term: str, block: str, subject: str) -> List[str]:
         """Get list of available categories for a subject"""
-        if (year not in NAVIGATION_STRUCTURE or 
-            "terms" not in NAVIGATION_STRUCTURE[year] or
-            term not in NAVIGATION_STRUCTURE[year]["terms"] or
-            "blocks" not in NAVIGATION_STRUCTURE[year]["terms"][term] or
-            block not in NAVIGATION_STRUCTURE[year]["terms"][term]["blocks"] or
-            "subjects" not in NAVIGATION_STRUCTURE[year]["terms"][term]["blocks"][block] or
-            subject not in NAVIGATION_STRUCTURE[year]["terms"][term]["blocks"][block]["subjects"]):
+        if (year, term, block, subject) not in _NAV_INDEX:
             return []
+        expected = _nav_children((year, term, block, subject)) or {}
         
         subject_path = os.path.join(CONFIG["data_dir"], year, term, block, subject)
         
-        # DEBUGGING: Print what we're looking for
-        print(f"🔍 FileManager.list_categories() called for: {year}/{term}/{block}/{subject}")
-        print(f"   📁 Looking in: {subject_path}")
+        # DEBUGGING: only build the trace when debug logging is on
+        debug = logger.isEnabledFor(logging.DEBUG)
         
         if not os.path.exists(subject_path):
-            print(f"   ❌ Subject path doesn't exist: {subject_path}")
+            if debug:
+                logger.debug(f"🔍 FileManager.list_categories() called for: {year}/{term}/{block}/{subject}\n"
+                             f"   ❌ Subject path doesn't exist: {subject_path}")
             return []
         
-        # Get actual directories
-        actual_dirs = [d for d in os.listdir(subject_path) 
-                      if os.path.isdir(os.path.join(subject_path, d)) and not d.startswith('.')]
-        
-        print(f"   📂 Actual directories found: {actual_dirs}")
-        
-        # Get expected categories from config
-        expected_categories = list(NAVIGATION_STRUCTURE[year]["terms"][term]["blocks"][block]["subjects"][subject]["categories"].keys())
-        print(f"   📋 Expected categories from config: {expected_categories}")
+        # Get actual directories (scandir exposes the file type without an extra stat per entry)
+        with os.scandir(subject_path) as entries:
+            actual_dirs = [e.name for e in entries if not e.name.startswith('.') and e.is_dir()]
         
         # Only return directories that exist AND are in config
-        categories = [c for c in actual_dirs
-                     if c in NAVIGATION_STRUCTURE[year]["terms"][term]["blocks"][block]["subjects"][subject]["categories"]]
+        categories = [c for c in actual_dirs if c in expected]
         
-        print(f"   ✅ Final categories returned: {categories}")
-        print()
+        if debug:
+            logger.debug(f"🔍 FileManager.list_categories() called for: {year}/{term}/{block}/{subject}\n"
+                         f"   📁 Looking in: {subject_path}\n"
+                         f"   📂 Actual directories found: {actual_dirs}\n"
+                         f"   📋 Expected categories from config: {list(expected)}\n"
+                         f"   ✅ Final categories returned: {categories}")
         
         return sorted(categories)
     
     @staticmethod
     def get_category_display_name(year: str, term: str, block: str, subject: str, category: str) -> str:
         """Get display name for category"""
-        structure = NAVIGATION_STRUCTURE
-        if (year in structure and 
-            "terms" in structure[year] and
-            term in structure[year]["terms"] and
-            "blocks" in structure[year]["terms"][term] and
-            block in structure[year]["terms"][term]["blocks"] and
-            "subjects" in structure[year]["terms"][term]["blocks"][block] and
-            subject in structure[year]["terms"][term]["blocks"][block]["subjects"] and
-            "categories" in structure[year]["terms"][term]["blocks"][block]["subjects"][subject] and
-            category in structure[year]["terms"][term]["blocks"][block]["subjects"][subject]["categories"]):
-            return structure[year]["terms"][term]["blocks"][block]["subjects"][subject]["categories"][category]["display_name"]
+        node = _NAV_INDEX.get((year, term, block, subject, category))
+        if node is not None:
+            return node["display_name"]
         return category.title()
     
     @staticmethod
-    @lru_cache(maxsize=1024)
+    @_dir_cache
     def list_subtopics(year: str, term: str, block: str, subject: str, category: str) -> List[str]:
         """Get list of available subtopics for a category - using numbered filenames"""
-        structure = NAVIGATION_STRUCTURE
-        if (year not in structure or 
-            "terms" not in structure[year] or
-            term not in structure[year]["terms"] or
-            "blocks" not in structure[year]["terms"][term] or
-            block not in structure[year]["terms"][term]["blocks"] or
-            "subjects" not in structure[year]["terms"][term]["blocks"][block] or
-            subject not in structure[year]["terms"][term]["blocks"][block]["subjects"] or
-            "categories" not in structure[year]["terms"][term]["blocks"][block]["subjects"][subject] or
-            category not in structure[year]["terms"][term]["blocks"][block]["subjects"][subject]["categories"]):
+        if (year, term, block, subject, category) not in _NAV_INDEX:
             return []
+        expected = _nav_children((year, term, block, subject, category)) or {}
         
         category_path = os.path.join(CONFIG["data_dir"], year, term, block, subject, category)
         
-        # DEBUGGING
-        print(f"🔍 FileManager.list_subtopics() called for: {year}/{term}/{block}/{subject}/{category}")
-        print(f"   📁 Looking in: {category_path}")
+        # DEBUGGING: only build the trace when debug logging is on
+        debug = logger.isEnabledFor(logging.DEBUG)
         
         if not os.path.exists(category_path):
-            print(f"   ❌ Category path doesn't exist: {category_path}")
+            if debug:
+                logger.debug(f"🔍 FileManager.list_subtopics() called for: {year}/{term}/{block}/{subject}/{category}\n"
+                             f"   ❌ Category path doesn't exist: {category_path}")
             return []
         
-        # Get all CSV files
-        all_csv_files = [f for f in os.listdir(category_path) if f.endswith('.csv') and not f.startswith('.')]
-        print(f"   📄 All CSV files found: {all_csv_files}")
-        
-        # Get expected subtopics from config
-        expected_subtopics = list(structure[year]["terms"][term]["blocks"][block]["subjects"][subject]["categories"][category]["subtopics"].keys())
-        print(f"   📋 Expected subtopics from config: {expected_subtopics}")
+        # Get all CSV files (scandir exposes the file type without an extra stat per entry)
+        with os.scandir(category_path) as entries:
+            all_csv_files = [e.name for e in entries
+                             if e.name.endswith('.csv') and not e.name.startswith('.') and e.is_file()]
         
         # Only return files that exist AND are in config
-        subtopics = []
-        for file in all_csv_files:
-            if file in structure[year]["terms"][term]["blocks"][block]["subjects"][subject]["categories"][category]["subtopics"]:
-                subtopics.append(file)
+        subtopics = [file for file in all_csv_files if file in expected]
         
         # Sort by the numeric prefix to maintain order
-        sorted_subtopics = sorted(subtopics, key=lambda x: (
-            int(x.split('_')[0]) if x.split('_')[0].isdigit() else float('inf'), 
-            x
-        ))
+        sorted_subtopics = sorted(subtopics, key=_subtopic_sort_key)
         
-        print(f"   ✅ Final subtopics returned: {sorted_subtopics}")
-        print()
+        if debug:
+            logger.debug(f"🔍 FileManager.list_subtopics() called for: {year}/{term}/{block}/{subject}/{category}\n"
+                         f"   📁 Looking in: {category_path}\n"
+                         f"   📄 All CSV files found: {all_csv_files}\n"
+                         f"   📋 Expected subtopics from config: {list(expected)}\n"
+                         f"   ✅ Final subtopics returned: {sorted_subtopics}")
         
         return sorted_subtopics
     
     @staticmethod
     def get_subtopic_display_name(year: str, term: str, block: str, subject: str, category: str, subtopic: str) -> str:
         """Get display name for subtopic - subtopic is the numbered filename"""
-        structure = NAVIGATION_STRUCTURE
-        if (year in structure and 
-            "terms" in structure[year] and
-            term in structure[year]["terms"] and
-            "blocks" in structure[year]["terms"][term] and
-            block in structure[year]["terms"][term]["blocks"] and
-            "subjects" in structure[year]["terms"][term]["blocks"][block] and
-            subject in structure[year]["terms"][term]["blocks"][block]["subjects"] and
-            "categories" in structure[year]["terms"][term]["blocks"][block]["subjects"][subject] and
-            category in structure[year]["terms"][term]["blocks"][block]["subjects"][subject]["categories"] and
-            "subtopics" in structure[year]["terms"][term]["blocks"][block]["subjects"][subject]["categories"][category] and
-            subtopic in structure[year]["terms"][term]["blocks"][block]["subjects"][subject]["categories"][category]["subtopics"]):
-            return structure[year]["terms"][term]["blocks"][block]["subjects"][subject]["categories"][category]["subtopics"][subtopic]
+        display_name = _NAV_INDEX.get((year, term, block, subject, category, subtopic))
+        if display_name is not None:
+            return display_name
         
         # Fallback: remove .csv and format the filename
         display_name = subtopic[:-4]  # Remove .csv
@@ -260,27 +247,15 @@ class FileManager:
     @staticmethod
     def load_questions(year: str, term: str, block: str, subject: str, category: str, subtopic: str) -> List[Dict]:
         """Load questions from CSV file - subtopic is the numbered filename"""
-        structure = NAVIGATION_STRUCTURE
-        
         # Check if this path exists in navigation structure
-        if (year not in structure or 
-            "terms" not in structure[year] or
-            term not in structure[year]["terms"] or
-            "blocks" not in structure[year]["terms"][term] or
-            block not in structure[year]["terms"][term]["blocks"] or
-            "subjects" not in structure[year]["terms"][term]["blocks"][block] or
-            subject not in structure[year]["terms"][term]["blocks"][block]["subjects"] or
-            "categories" not in structure[year]["terms"][term]["blocks"][block]["subjects"][subject] or
-            category not in structure[year]["terms"][term]["blocks"][block]["subjects"][subject]["categories"] or
-            "subtopics" not in structure[year]["terms"][term]["blocks"][block]["subjects"][subject]["categories"][category] or
-            subtopic not in structure[year]["terms"][term]["blocks"][block]["subjects"][subject]["categories"][category]["subtopics"]):
+        if (year, term, block, subject, category, subtopic) not in _NAV_INDEX:
             logger.error(f"❌ Path not in navigation structure: {year}/{term}/{block}/{subject}/{category}/{subtopic}")
             return []
         
         # Construct file path - subtopic is already the filename
         file_path = os.path.join(CONFIG["data_dir"], year, term, block, subject, category, subtopic)
         
-        logger.info(f"📁 Loading questions from: {file_path}")
+        logger.debug(f"📁 Loading questions from: {file_path}")
         
         if not os.path.exists(file_path):
             logger.error(f"❌ Question file not found: {file_path}")
@@ -292,6 +267,9 @@ class FileManager:
                 reader = csv.reader(f)
                 row_count = 0
                 valid_questions = 0
+                invalid_answers = 0
+                # Per-row details only when debugging; a summary is logged once below
+                debug = logger.isEnabledFor(logging.DEBUG)
                 
                 for i, row in enumerate(reader, 1):
                     row_count += 1
@@ -300,17 +278,20 @@ class FileManager:
                     if not row or not any(row) or row[0].startswith('#') or len(row) < 6:
                         continue
                     
-                    # Clean and validate data
-                    cleaned_row = [x.strip() for x in row[:6] if x.strip()]
-                    if len(cleaned_row) < 6:
+                    # Clean and validate data: strip each field once, reject rows with a blank field
+                    question, opt_a, opt_b, opt_c, opt_d, correct = (
+                        row[0].strip(), row[1].strip(), row[2].strip(),
+                        row[3].strip(), row[4].strip(), row[5].strip())
+                    if not (question and opt_a and opt_b and opt_c and opt_d and correct):
                         continue
                     
-                    question, opt_a, opt_b, opt_c, opt_d, correct = cleaned_row
                     correct = correct.upper()
                     
                     # Validate correct answer format
-                    if correct not in ['A', 'B', 'C', 'D']:
-                        logger.warning(f"⚠️ Invalid correct answer in row {i}: '{correct}'")
+                    if correct not in _VALID_ANSWERS:
+                        invalid_answers += 1
+                        if debug:
+                            logger.debug(f"⚠️ Invalid correct answer in row {i}: '{correct}'")
                         continue
                     
                     # Sanitize all text
@@ -328,7 +309,10 @@ class FileManager:
                     })
                     valid_questions += 1
             
-            logger.info(f"✅ Loaded {valid_questions} valid questions from {row_count} rows")
+            logger.info(f"✅ Loaded {valid_questions} valid questions from {row_count} rows in {file_path}")
+            
+            if invalid_answers:
+                logger.warning(f"⚠️ Skipped {invalid_answers} rows with an invalid correct answer in {file_path}")
             
             if valid_questions == 0:
                 logger.warning(f"⚠️ No valid questions found in {file_path}")
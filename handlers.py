@@ -9,12 +9,14 @@ import asyncio
 Bot command and callback handlers for 6-level navigation with AI essay support
 """
 import logging
+import asyncio
 import requests
 >>>>>>> Stashed changes
 =======
 Bot command and callback handlers for 6-level navigation with AI essay support
 """
 import logging
+import asyncio
 import requests
 >>>>>>> Stashed changes
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
@@ -330,10 +332,14 @@ class BotHandlers:
                 "context": f"medical_education_{essay_data['subject']}"
             }
             
-            response = requests.post(
-                CONFIG["n8n_essay_webhook"],
-                json=payload,
-                timeout=45  # Longer timeout for AI processing
+            # Call n8n webhook synchronously in thread so other users aren't blocked while grading
+            response = await asyncio.get_event_loop().run_in_executor(
+                None,
+                lambda: self.quiz_manager.http.post(
+                    CONFIG["n8n_essay_webhook"],
+                    json=payload,
+                    timeout=(3, 45)  # Short connect, longer read for AI processing
+                )
             )
             
             if response.status_code == 200:
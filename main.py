@@ -7,7 +7,7 @@ import os
 from telegram.ext import Application
 from telegram.error import TelegramError
 
-from config import TOKEN, CONFIG
+from config import CONFIG, require_token
 from database import DatabaseManager
 from file_manager import FileManager
 from quiz_manager import QuizManager
@@ -62,12 +62,12 @@ async def error_handler(update, context):
 def main():
     """Start the bot with Railway compatibility"""
     
+    # Validate environment before touching the lock
+    token = require_token()
+    
     # Acquire startup lock
     lock_file = acquire_railway_lock()
-    
-    if not TOKEN:
-        logger.error("❌ No bot token provided.")
-        return
+    db = None
     
     try:
         # Initialize components
@@ -83,7 +83,7 @@ def main():
         bot_handlers = BotHandlers(db, quiz_manager)
         
         # Create application
-        application = Application.builder().token(TOKEN).build()
+        application = Application.builder().token(token).build()
         
         # Register handlers
         bot_handlers.register_handlers(application)
@@ -111,6 +111,10 @@ def main():
         print(f"❌ Bot failed to start: {e}")
     
     finally:
+        # Write out any buffered progress before exiting
+        if db:
+            db.close()
+        
         # Release lock on exit
         if lock_file and os.path.exists(lock_file):
             try:
@@ -5,6 +5,7 @@ import random
 import asyncio
 import logging
 import requests
+from requests.adapters import HTTPAdapter
 from typing import Dict, List
 
 from telegram import Update
@@ -19,6 +20,9 @@ logger = logging.getLogger(__name__)
 class QuizManager:
     def __init__(self, database: DatabaseManager):
         self.db = database
+        # Keep-alive session so repeated webhook calls reuse the TCP/TLS connection
+        self.http = requests.Session()
+        self.http.mount('https://', HTTPAdapter(pool_connections=2, pool_maxsize=8))
     
     @staticmethod
     def shuffle_choices(question_data: Dict) -> Dict:
@@ -61,10 +65,10 @@ class QuizManager:
             # Call n8n webhook synchronously in thread
             response = await asyncio.get_event_loop().run_in_executor(
                 None, 
-                lambda: requests.post(
+                lambda: self.http.post(
                     CONFIG["n8n_mcq_webhook"], 
                     json=payload, 
-                    timeout=15
+                    timeout=(3, 15)  # (connect, read): fail fast if n8n is unreachable
                 )
             )
             
@@ -195,7 +199,7 @@ class QuizManager:
         return True
 
     async def send_next_question(self, update: Update, context: CallbackContext):
-        """Send the next question in the quiz"""
+        """Send the next question in the quiz, skipping any that fail to send"""
         user_data = context.user_data
         
         print(f"🔍 SEND_NEXT_QUESTION called")
@@ -203,50 +207,52 @@ class QuizManager:
         print(f"   Current question: {user_data.get('current_question')}")
         print(f"   Total questions: {len(user_data.get('questions', []))}")
         
-        if not user_data.get("quiz_active"):
-            print(f"❌ Quiz not active - returning")
-            return
-        
-        current_index = user_data["current_question"]
-        questions = user_data["questions"]
-        chat_id = user_data["chat_id"]
-        
-        if current_index >= len(questions):
-            print(f"🎯 Quiz finished - calling finish_quiz")
-            await self.finish_quiz(update, context)
-            return
-        
-        print(f"📝 Sending question {current_index + 1}/{len(questions)}")
-        
-        original_question = questions[current_index]
-        shuffled_question = self.shuffle_choices(original_question)
-        user_data["current_shuffled"] = shuffled_question
-        
-        progress = f"Question {current_index + 1}/{len(questions)}\n\n"
-        question_text = progress + shuffled_question["question"]
-        
-        try:
-            message = await context.bot.send_poll(
-                chat_id=chat_id,
-                question=question_text,
-                options=shuffled_question["options"],
-                type="quiz",
-                correct_option_id=shuffled_question["correct_index"],
-                is_anonymous=False,
-            )
+        # Loop instead of recursing on failure so repeated send errors don't grow the await chain
+        while True:
+            if not user_data.get("quiz_active"):
+                print(f"❌ Quiz not active - returning")
+                return
             
-            user_data["active_poll_id"] = message.poll.id
-            user_data["poll_message_id"] = message.message_id
+            current_index = user_data["current_question"]
+            questions = user_data["questions"]
+            chat_id = user_data["chat_id"]
             
-            print(f"✅ Question {current_index + 1} sent successfully")
-            print(f"   Poll ID: {message.poll.id}")
-            print(f"   Message ID: {message.message_id}")
+            if current_index >= len(questions):
+                print(f"🎯 Quiz finished - calling finish_quiz")
+                await self.finish_quiz(update, context)
+                return
             
-        except Exception as e:
-            print(f"❌ Error sending question {current_index + 1}: {e}")
-            user_data["current_question"] += 1
-            await asyncio.sleep(2)
-            await self.send_next_question(update, context)
+            print(f"📝 Sending question {current_index + 1}/{len(questions)}")
+            
+            original_question = questions[current_index]
+            shuffled_question = self.shuffle_choices(original_question)
+            user_data["current_shuffled"] = shuffled_question
+            
+            progress = f"Question {current_index + 1}/{len(questions)}\n\n"
+            question_text = progress + shuffled_question["question"]
+            
+            try:
+                message = await context.bot.send_poll(
+                    chat_id=chat_id,
+                    question=question_text,
+                    options=shuffled_question["options"],
+                    type="quiz",
+                    correct_option_id=shuffled_question["correct_index"],
+                    is_anonymous=False,
+                )
+                
+                user_data["active_poll_id"] = message.poll.id
+                user_data["poll_message_id"] = message.message_id
+                
+                print(f"✅ Question {current_index + 1} sent successfully")
+                print(f"   Poll ID: {message.poll.id}")
+                print(f"   Message ID: {message.message_id}")
+                return
+                
+            except Exception as e:
+                print(f"❌ Error sending question {current_index + 1}: {e}")
+                user_data["current_question"] += 1
+                await asyncio.sleep(2)
 
     async def handle_poll_answer(self, update: Update, context: CallbackContext):
         """Handle poll answers with AI explanations"""
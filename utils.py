@@ -22,18 +22,19 @@ def acquire_startup_lock():
         logger.error("❌ Another bot instance is already running!")
         exit(1)
 
+# Markdown special characters, escaped in one str.translate pass instead of one str.replace per character
+_MARKDOWN_ESCAPES = str.maketrans({char: f'\\{char}' for char in '_*[]()~`>#+-=|{}.!'})
+_BACKSLASH_RUN_RE = re.compile(r'\\{2,}')
+
 def sanitize_text(text: str) -> str:
     """Sanitize text to prevent Markdown parsing errors"""
     if not text:
         return ""
     
-    text = html.escape(text)
-    markdown_chars = ['_', '*', '[', ']', '(', ')', '~', '`', '>', '#', '+', '-', '=', '|', '{', '}', '.', '!']
-    
-    for char in markdown_chars:
-        text = text.replace(char, f'\\{char}')
-    
-    text = re.sub(r'\\+', r'\\', text)
+    text = html.escape(text).translate(_MARKDOWN_ESCAPES)
+    # Collapse runs of backslashes; most text has none, so skip the regex then
+    if '\\\\' in text:
+        text = _BACKSLASH_RUN_RE.sub(r'\\', text)
     return text
 
 def validate_topic_name(topic: str) -> bool: